@@ -12,16 +12,22 @@ Sync “Validity status” between two TruffleHog Google Sheets.
 
 Dependencies
 ------------
-pip install gspread google-auth pandas tqdm
+pip install gspread google-auth numpy pandas tqdm
 """
 
 from __future__ import annotations
+import random
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Iterator, List
 
+import numpy as np
 import pandas as pd
 import gspread
+from gspread.utils import absolute_range_name, fill_gaps, rowcol_to_a1
 from google.oauth2.service_account import Credentials
 from tqdm import tqdm
 
@@ -38,7 +44,9 @@ Q2_WS_NAME        = "Trufflehog Data"
 Q2_LINK_HEADER    = "Link"
 Q2_STATUS_HEADER  = "Validity status"
 
-UPLOAD_CHUNK      = 2000             # rows per API call
+UPLOAD_CHUNK      = 50_000           # cells per batchUpdate request
+UPLOAD_WORKERS    = 8                # batchUpdate requests in flight
+MAX_RETRIES       = 6                # per request, on HTTP 429 (quota)
 # ────────────────────────────────────────────────────────────
 
 
@@ -54,52 +62,121 @@ def gspread_client():
     )
 
 
+def fetch_ranges(ws, *rngs: str | None) -> List[List[List[str]]]:
+    """Fetch several ranges of the worksheet in one values.batchGet call.
+
+    Each range comes back as a padded grid; an empty one as [[]], like
+    Worksheet.get. A range of None means the whole sheet.
+    """
+    resp = ws.spreadsheet.values_batch_get(
+        ranges=[absolute_range_name(ws.title, rng) for rng in rngs]
+    )
+    return [
+        fill_gaps(vr["values"]) if vr.get("values") else [[]]
+        for vr in resp["valueRanges"]
+    ]
+
+
+def fetch_values(ws, rng: str | None = None) -> List[List[str]]:
+    """Return the worksheet's cell values (only *rng*, if given) as a padded grid."""
+    return fetch_ranges(ws, rng)[0]
+
+
 def ws_to_df(ws) -> pd.DataFrame:
-    rows = ws.get_all_values()
+    rows = fetch_values(ws)
     return pd.DataFrame(rows[1:], columns=rows[0])
 
 
 def build_q4_mapping(ws) -> Dict[str, str]:
-    """Return {github_link: status} from the Q4 worksheet."""
-    rows = ws.get_all_values()
-    header = rows[0]
+    """Return {github_link: status} from the Q4 worksheet.
+
+    A link listed more than once (re-scans) keeps its last row's status.
+    """
+    # header row + A:N in one round trip; nothing right of N is usually needed
+    status_col = rowcol_to_a1(1, Q4_STATUS_COL_N + 1)[:-1]   # "N1" → "N"
+    head, rows = fetch_ranges(ws, "1:1", f"A:{status_col}")
     try:
-        link_idx = header.index(Q4_LINK_HEADER)
+        link_idx = head[0].index(Q4_LINK_HEADER)
     except ValueError:
         sys.exit(f"[ERROR] Column {Q4_LINK_HEADER!r} not found in Q4 sheet.")
 
-    mapping: Dict[str, str] = {}
-    for r in rows[1:]:
-        if len(r) <= max(link_idx, Q4_STATUS_COL_N):
-            continue
-        link   = r[link_idx].strip()
-        status = r[Q4_STATUS_COL_N].strip()
-        if link:
-            mapping[link] = status
-    return mapping
-
+    # link column right of N: fetch again, wide enough to include it
+    width = max(link_idx, Q4_STATUS_COL_N)
+    if link_idx > Q4_STATUS_COL_N:
+        rows = fetch_values(ws, f"A:{rowcol_to_a1(1, link_idx + 1)[:-1]}")
 
-def ensure_status_column(ws_q2, df_q2: pd.DataFrame):
-    """Add ‘Validity status’ column (sheet + DataFrame) if missing."""
-    if Q2_STATUS_HEADER in df_q2.columns:
-        return df_q2, df_q2.columns.get_loc(Q2_STATUS_HEADER)
+    pick  = itemgetter(link_idx, Q4_STATUS_COL_N)
+    pairs = (pick(r) for r in rows[1:] if len(r) > width)
+    # strip each link exactly once; Q2 links get the same .strip() in main()
+    return {
+        key: status.strip()
+        for link, status in pairs
+        if (key := link.strip())
+    }
 
-    # add empty column at far right
-    ws_q2.add_cols(1)
-    new_col_idx_1 = len(df_q2.columns) + 1  # 1-based
-    ws_q2.update_cell(1, new_col_idx_1, Q2_STATUS_HEADER)
 
-    df_q2[Q2_STATUS_HEADER] = ""
-    return df_q2, new_col_idx_1 - 1          # return 0-based index
+def ensure_status_column(df_q2: pd.DataFrame):
+    """Add ‘Validity status’ to the DataFrame if missing.
 
+    Returns (df, 0-based column index, added?). The sheet itself is only
+    widened later, once there is something to write.
+    """
+    if Q2_STATUS_HEADER in df_q2.columns:
+        return df_q2, df_q2.columns.get_loc(Q2_STATUS_HEADER), False
 
-def col_letter(idx_1based: int) -> str:
-    """Convert 1-based column index to sheet column letters."""
-    res = ""
-    while idx_1based:
-        idx_1based, rem = divmod(idx_1based - 1, 26)
-        res = chr(65 + rem) + res
-    return res
+    df_q2[Q2_STATUS_HEADER] = ""
+    return df_q2, len(df_q2.columns) - 1, True     # new column at far right
+
+
+def column_ranges(ws, col: int, first_row: int, values: List[str]) -> Iterator[dict]:
+    """Yield ValueRanges (≤ UPLOAD_CHUNK cells) writing *values* down column *col*."""
+    for i in range(0, len(values), UPLOAD_CHUNK):
+        chunk  = values[i : i + UPLOAD_CHUNK]
+        top    = first_row + i
+        bottom = top + len(chunk) - 1
+        yield {
+            "range": absolute_range_name(
+                ws.title, f"{rowcol_to_a1(top, col)}:{rowcol_to_a1(bottom, col)}"
+            ),
+            "majorDimension": "COLUMNS",
+            "values": [chunk],
+        }
+
+
+def push_value_ranges(ws, data: List[dict]) -> None:
+    """Write ValueRanges with values.batchUpdate, ≤ UPLOAD_CHUNK cells per request."""
+    batches: List[List[dict]] = []
+    batch: List[dict] = []
+    cells = 0
+    for vr in data:
+        n = len(vr["values"][0])
+        if batch and cells + n > UPLOAD_CHUNK:
+            batches.append(batch)
+            batch, cells = [], 0
+        batch.append(vr)
+        cells += n
+    if batch:
+        batches.append(batch)
+
+    # requests are independent, so overlap their round trips
+    with ThreadPoolExecutor(max_workers=UPLOAD_WORKERS) as pool:
+        jobs = pool.map(lambda b: batch_update(ws, b), batches)
+        for _ in tqdm(jobs, total=len(batches), desc="Uploading", ncols=80):
+            pass
+
+
+def batch_update(ws, data: List[dict]) -> None:
+    """One values.batchUpdate call, backing off exponentially on quota errors."""
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            ws.spreadsheet.values_batch_update(
+                body={"valueInputOption": "RAW", "data": data}
+            )
+            return
+        except gspread.exceptions.APIError as exc:
+            if exc.response.status_code != 429 or attempt == MAX_RETRIES:
+                raise
+            time.sleep(2 ** attempt + random.random())
 
 
 # ---------- main flow ---------------------------------------------------------
@@ -121,31 +198,39 @@ def main() -> None:
     print(f"[INFO] Q2 → loaded {len(df_q2):,} rows")
 
     # ensure target column exists
-    df_q2, status_col_zero = ensure_status_column(ws_q2, df_q2)
+    df_q2, status_col_zero, added = ensure_status_column(df_q2)
     status_col_one = status_col_zero + 1
 
     # copy statuses on link match
-    matches = 0
-    for idx, row in df_q2.iterrows():
-        link = row.get(Q2_LINK_HEADER, "").strip()
-        if link in link_to_status:
-            df_q2.at[idx, Q2_STATUS_HEADER] = link_to_status[link]
-            matches += 1
-    print(f"[INFO] {matches:,} links matched – updating Q2 sheet…")
-
-    # push updates in chunks
-    colLtr = col_letter(status_col_one)
-    total  = len(df_q2)
-    values = [[v] for v in df_q2[Q2_STATUS_HEADER].tolist()]
-
-    for i in tqdm(range(0, total, UPLOAD_CHUNK), desc="Uploading", ncols=80):
-        chunk_vals = values[i : i + UPLOAD_CHUNK]
-        start_row  = i + 2                       # skip header (row 1)
-        end_row    = start_row + len(chunk_vals) - 1
-        rng        = f"{colLtr}{start_row}:{colLtr}{end_row}"
-
-        # new order: values first, range second
-        ws_q2.update(chunk_vals, rng, value_input_option="RAW")
+    if Q2_LINK_HEADER not in df_q2.columns:
+        sys.exit(f"[ERROR] Column {Q2_LINK_HEADER!r} not found in Q2 sheet.")
+    q2_links = df_q2[Q2_LINK_HEADER].str.strip()        # normalised once
+    matched  = q2_links.map(link_to_status)
+    current = df_q2[Q2_STATUS_HEADER]
+    changed = np.flatnonzero((matched.notna() & (matched != current)).to_numpy())
+    matches = int(matched.notna().sum())
+    df_q2[Q2_STATUS_HEADER] = matched.fillna(current)
+    print(f"[INFO] {matches:,} links matched, {changed.size:,} statuses changed")
+    if not changed.size:
+        print("✅ Nothing to update — Q2 sheet left untouched.")
+        return
+
+    values = df_q2[Q2_STATUS_HEADER].to_numpy()
+
+    # new column: widen the sheet, send the header cell with the statuses
+    data: List[dict] = []
+    if added:
+        ws_q2.add_cols(1)
+        data.extend(column_ranges(ws_q2, status_col_one, 1, [Q2_STATUS_HEADER]))
+
+    # push only the changed cells, one range per run of consecutive rows
+    for run in np.split(changed, np.flatnonzero(np.diff(changed) != 1) + 1):
+        first, last = int(run[0]), int(run[-1])
+        # +2: DataFrame row 0 is sheet row 2 (row 1 is the header)
+        run_vals = values[first : last + 1].tolist()
+        data.extend(column_ranges(ws_q2, status_col_one, first + 2, run_vals))
+    print("[INFO] Updating Q2 sheet…")
+    push_value_ranges(ws_q2, data)
 
     print("✅ Sync complete — open the Q2 sheet to verify.")
 